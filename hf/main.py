@@ -1,3 +1,8 @@
+import os
+
+os.environ.setdefault("HF_HUB_ENABLE_HF_TRANSFER", "1")
+
+from concurrent.futures import ThreadPoolExecutor
 from huggingface_hub import hf_hub_download
 from pathlib import Path
 import json
@@ -14,9 +19,18 @@ models = [
     "meta-llama/Llama-2-70b-hf",
 ]
 
-configs = {}
-for model in models:
+
+def fetch(model):
     with Path(hf_hub_download(repo_id=model, filename="config.json")).open() as f:
-        configs[model] = json.load(f)
-with Path("configs.json").open("w") as f:
+        return model, json.load(f)
+
+
+path = Path("configs.json")
+configs = json.loads(path.read_text()) if path.exists() else {}
+missing = [model for model in models if model not in configs]
+if missing:
+    with ThreadPoolExecutor(max_workers=len(missing)) as ex:
+        configs.update(ex.map(fetch, missing))
+configs = {model: configs[model] for model in models}
+with path.open("w") as f:
     json.dump(configs, f)
@@ -1,9 +1,15 @@
-from bs4 import BeautifulSoup
-from more_itertools import consume
+from bs4 import BeautifulSoup, SoupStrainer
 import requests
+import requests_cache
 import pandas as pd
 import re
-from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
+from pathlib import Path
+import hashlib
+import os
+import pickle
+import tempfile
 
 prices = pd.DataFrame.from_records(
     [
@@ -29,26 +35,37 @@ prices = pd.DataFrame.from_records(
         {"Name": "Jetson TX2 4GB", "Price": None},
         {"Name": "Jetson TX2 NX", "Price": 199},
         {"Name": "Jetson Nano", "Price": 129},
-    ]
+    ],
+    index="Name",
 )
 
 
+def per_unique(normalize):
+    @wraps(normalize)
+    def wrapper(column):
+        unique = pd.Series(column.unique())
+        return column.map(dict(zip(unique, normalize(unique))))
+
+    return wrapper
+
+
+_UNIT_MAP = {
+    "TOPS": (1, "TOPS (INT8-Sparse)"),
+    "TOPs": (1, "TOPS (INT8-Sparse)"),
+    "TFLOPS": (1, "TFLOPS (FP16-Dense)"),
+    "GFLOPS": (1 / 1000, "TFLOPS (FP16-Dense)"),
+    "TFLOPS (FP4—Sparse)": (1, "TFLOPS (FP4-Sparse)"),
+}
+
+
+@per_unique
 def normalize_flops(flops):
-    flops, unit = flops.split(maxsplit=1)
-    flops = float(flops)
-    match unit:
-        case "TOPS" | "TOPs":
-            unit = "TOPS (INT8-Sparse)"
-        case "TFLOPS":
-            unit = "TFLOPS (FP16-Dense)"
-        case "GFLOPS":
-            flops /= 1000
-            unit = "TFLOPS (FP16-Dense)"
-        case "TFLOPS (FP4—Sparse)":
-            unit = "TFLOPS (FP4-Sparse)"
-        case _:
-            raise NotImplementedError
-    return f"{flops:g} {unit}"
+    flops = flops.str.split(n=1, expand=True)
+    unit = flops[1].map(_UNIT_MAP)
+    if unit.isna().any():
+        raise NotImplementedError(*flops[1][unit.isna()].unique())
+    flops = flops[0].astype(float) * unit.str[0]
+    return flops.map("{:g}".format) + " " + unit.str[1]
 
 
 gpu_re = re.compile(
@@ -61,22 +78,23 @@ gpu_re = re.compile(
 )
 
 
+@per_unique
 def normalize_gpu(gpu):
-    match = gpu_re.match(gpu)
-    core = int(match.group("core"))
-    arch = match.group("arch").rstrip("™").removesuffix(" c")
-    tensor_gen = match.group("tensor_gen")
-    tensor = int(match.group("tensor") or 0)
-    extra = match.group("extra") or ""
-    gpu = f"{core}-core {arch}"
-    if tensor > 0:
-        if tensor_gen:
-            gpu += f" with {tensor} {tensor_gen} tensor cores"
-        else:
-            gpu += f" with {tensor} tensor cores"
-    if extra:
-        gpu += f" and {extra.strip()}"
-    return gpu
+    match = gpu.str.extract(gpu_re)
+    if match["core"].isna().any():
+        raise ValueError(*gpu[match["core"].isna()])
+    core = match["core"].astype(int).astype(str)
+    arch = match["arch"].str.rstrip("™").str.removesuffix(" c")
+    tensor_gen = match["tensor_gen"]
+    tensor = match["tensor"].fillna(0).astype(int)
+    extra = match["extra"].fillna("")
+    gpu = core + "-core " + arch
+    cores = " with " + tensor.astype(str)
+    cores = (cores + " tensor cores").where(
+        tensor_gen.isna(), cores + " " + tensor_gen + " tensor cores"
+    )
+    gpu = gpu.where(tensor == 0, gpu + cores)
+    return gpu.where(extra == "", gpu + " and " + extra.str.strip())
 
 
 memory_re = re.compile(
@@ -84,41 +102,38 @@ memory_re = re.compile(
 )
 
 
+@per_unique
 def normalize_memory(memory):
-    match = memory_re.match(memory)
-    size = match.group(1)
-    width = match.group(2)
-    gen = match.group(3)
-    ecc = match.group(4) is not None
-    speed = float(match.group(5))
-    memory = f"{size} GB {width}-bit {gen} @ {speed} GB/s"
-    if ecc:
-        memory += " ECC"
-    return memory
-
-
-def url_to_df(
-    url,
-    offset,
-    name_offset,
-    table_id="jetson-prod-module-table",
-    nano=False,
-):
-    r = requests.get(url)
+    match = memory.str.extract(memory_re)
+    if match[0].isna().any():
+        raise ValueError(*memory[match[0].isna()])
+    size, width, gen, ecc, speed = (match[i] for i in range(5))
+    speed = speed.astype(float).astype(str)
+    memory = size + " GB " + width + "-bit " + gen + " @ " + speed + " GB/s"
+    return memory.where(ecc.isna(), memory + " ECC")
+
+
+def fetch_html(url, session=requests):
+    r = session.get(url)
     r.raise_for_status()
-    s = BeautifulSoup(r.text, features="html.parser")
-    table = s.find(id=table_id)
-    data = OrderedDict()
-    rows = iter(table.find_all("tr"))
-    consume(rows, offset)
-    data["Name"] = [col.get_text().strip() for col in next(rows).find_all("td")][
-        name_offset:
-    ]
-    for row in rows:
+    return r.text
+
+
+def parse_table(html, offset, name_offset, table_id, nano):
+    strainer = SoupStrainer("table", id=table_id)
+    s = BeautifulSoup(html, features="lxml", parse_only=strainer)
+    table = s.find("table")
+    data = {}
+    rows = table.find_all("tr")
+    data["Name"] = [
+        col.get_text().strip() for col in rows[offset].find_all("td", recursive=False)
+    ][name_offset:]
+    for row in rows[offset + 1 :]:
         content = []
-        for ic, col in enumerate(row.find_all("td")):
+        for ic, col in enumerate(row.find_all("td", recursive=False)):
+            text = col.get_text().strip()
             if ic == 0:
-                label = col.get_text().strip().rstrip("*")
+                label = text.rstrip("*")
                 match label:
                     case "Camera" | "CSI Camera":
                         label = "Camera"
@@ -126,56 +141,100 @@ def url_to_df(
                 #         label = "Accelerator"
             else:
                 if nano:
-                    content.append(col.get_text().strip())
+                    content.append(text)
                 else:
-                    content.extend(
-                        int(col.get("colspan", 1)) * [col.get_text().strip()]
-                    )
+                    span = int(col.get("colspan", 1))
+                    content.extend(span * [text])
+        if len(content) != len(data["Name"]):
+            raise ValueError(
+                f"{table_id}: {label!r} has {len(content)} cells,"
+                f" expected {len(data['Name'])}"
+            )
         data[label] = content
-    return pd.DataFrame(data)
+    return list(data.items())
 
 
-def main():
-    orin = url_to_df(
-        "https://www.nvidia.com/en-us/autonomous-machines/embedded-systems/jetson-orin/",
+cache_dir = Path("cache")
+# Part of the cache key; bump whenever parse_table may produce different output.
+parse_version = 6
+
+
+def parse_html(
+    html,
+    offset,
+    name_offset,
+    table_id="jetson-prod-module-table",
+    nano=False,
+):
+    args = (offset, name_offset, table_id, nano)
+    key = hashlib.sha1(repr((parse_version, html, *args)).encode()).hexdigest()
+    path = cache_dir / f"{key}.pkl"
+    try:
+        with path.open("rb") as f:
+            data = pickle.load(f)
+    except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+        data = parse_table(html, *args)
+        cache_dir.mkdir(exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=cache_dir, delete=False) as f:
+            pickle.dump(data, f)
+        os.replace(f.name, path)
+    return pd.DataFrame.from_dict(dict(data))
+
+
+pages = {
+    "https://www.nvidia.com/en-us/autonomous-machines/embedded-systems/jetson-orin/": dict(
         offset=1,
         name_offset=0,
-    )
-    thor = url_to_df(
-        "https://www.nvidia.com/en-us/autonomous-machines/embedded-systems/jetson-thor/",
+    ),
+    "https://www.nvidia.com/en-us/autonomous-machines/embedded-systems/jetson-thor/": dict(
         offset=0,
         name_offset=1,
-    )
-    xavier = url_to_df(
-        "https://www.nvidia.com/en-us/autonomous-machines/embedded-systems/jetson-xavier-series/",
+    ),
+    "https://www.nvidia.com/en-us/autonomous-machines/embedded-systems/jetson-xavier-series/": dict(
         offset=1,
         name_offset=0,
         table_id="jetson-xavier-table",
-    )
-    tx2 = url_to_df(
-        "https://www.nvidia.com/en-us/autonomous-machines/embedded-systems/jetson-tx2/",
+    ),
+    "https://www.nvidia.com/en-us/autonomous-machines/embedded-systems/jetson-tx2/": dict(
         offset=1,
         name_offset=0,
         table_id="jetson-tx2-table",
-    )
-    nano = url_to_df(
-        "https://www.nvidia.com/en-us/autonomous-machines/embedded-systems/jetson-nano/product-development/",
+    ),
+    "https://www.nvidia.com/en-us/autonomous-machines/embedded-systems/jetson-nano/product-development/": dict(
         offset=0,
         name_offset=1,
         table_id="jetson-tx2-table",
         nano=True,
+    ),
+}
+
+
+def main():
+    session = requests_cache.CachedSession(
+        "nvidia_cache", cache_control=True, expire_after=86400
+    )
+    with ThreadPoolExecutor(max_workers=len(pages)) as ex:
+        htmls = list(ex.map(partial(fetch_html, session=session), pages))
+    jetson = pd.concat(
+        [parse_html(html, **kwargs) for html, kwargs in zip(htmls, pages.values())],
+        ignore_index=True,
     )
-    jetson = pd.concat([orin, thor, xavier, tx2, nano]).reset_index(drop=True)
-    jetson = jetson.merge(prices, on="Name")
-    jetson["AI Performance"] = jetson["AI Performance"].apply(normalize_flops)
-    jetson["GPU"] = jetson["GPU"].apply(normalize_gpu)
-    jetson["Memory"] = jetson["Memory"].apply(normalize_memory)
+    jetson = jetson.join(prices, on="Name", how="inner", validate="m:1")
+    jetson = jetson.reset_index(drop=True)
+    jetson["AI Performance"] = normalize_flops(jetson["AI Performance"])
+    jetson["GPU"] = normalize_gpu(jetson["GPU"])
+    jetson["Memory"] = normalize_memory(jetson["Memory"])
     jetson.to_csv("jetson.csv", sep="\t")
-    jetson.to_excel("jetson.xlsx", sheet_name="Jetson", freeze_panes=(1, 2))
+    jetson.to_excel(
+        "jetson.xlsx", sheet_name="Jetson", freeze_panes=(1, 2), engine="xlsxwriter"
+    )
 
     jetson_tldr = jetson[["Name", "AI Performance", "Memory", "Power", "Price"]]
     jetson_tldr.to_excel(
-        "jetson_tldr.xlsx", sheet_name="Jetson TLDR", freeze_panes=(1, 2)
+        "jetson_tldr.xlsx",
+        sheet_name="Jetson TLDR",
+        freeze_panes=(1, 2),
+        engine="xlsxwriter",
     )
 
 